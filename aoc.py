@@ -0,0 +1,149 @@
+from utils import (
+    cprofile_to,
+    enable_profiling,
+    get_input,
+    get_input_path,
+    load_parsed,
+    profiling_report,
+)
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+import argparse
+import importlib
+import os
+import re
+import sys
+import time
+
+
+@dataclass(frozen=True)
+class PartResult:
+    answer: Any
+    seconds: float
+
+
+@dataclass(frozen=True)
+class DayResult:
+    day: int
+    parse_seconds: float
+    parts: tuple[PartResult, ...]
+
+
+def discover_days() -> list[int]:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return sorted(
+        int(match.group(1))
+        for filename in os.listdir(directory)
+        if (match := re.fullmatch(r"day_(\d{2})\.py", filename))
+    )
+
+
+def parse_days(spec: str) -> list[int]:
+    # e.g. "1-3,5" -> [1, 2, 3, 5]
+    days: set[int] = set()
+    for part in spec.split(","):
+        start, _, end = part.partition("-")
+        days.update(range(int(start), int(end or start) + 1))
+    return sorted(days)
+
+
+def run_day(day: int, use_cache: bool = True) -> DayResult:
+    # every day module exposes parse(text), puzzle_1(parsed) and puzzle_2(parsed)
+    module = importlib.import_module(f"day_{str(day).rjust(2, '0')}")
+
+    started = time.perf_counter()
+    # days opt in, as unpickling big object graphs can be slower than parsing
+    if use_cache and module.CACHE_PARSED:
+        parsed = load_parsed(day, module.parse, module.PARSER_VERSION)
+    else:
+        parsed = module.parse(get_input(day))
+    parse_seconds = time.perf_counter() - started
+
+    parts: list[PartResult] = []
+    for puzzle in (module.puzzle_1, module.puzzle_2):
+        started = time.perf_counter()
+        answer = puzzle(parsed)
+        parts.append(PartResult(answer=answer, seconds=time.perf_counter() - started))
+
+    return DayResult(day=day, parse_seconds=parse_seconds, parts=tuple(parts))
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def print_result(result: DayResult) -> None:
+    print(
+        f"Day {str(result.day).rjust(2, '0')} (parse {format_seconds(result.parse_seconds)})"
+    )
+    for number, part in enumerate(result.parts, start=1):
+        print(f"  Part {number}: {part.answer} ({format_seconds(part.seconds)})")
+
+
+def run(days: list[int], jobs: int, use_cache: bool = True) -> None:
+    missing_days = [day for day in days if not os.path.exists(get_input_path(day))]
+    for day in missing_days:
+        print(f"Day {str(day).rjust(2, '0')} skipped, {get_input_path(day)} is missing")
+    days = [day for day in days if day not in missing_days]
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # map keeps the order of the days, while they run in parallel
+            for result in executor.map(run_day, days, [use_cache] * len(days)):
+                print_result(result)
+    else:
+        for day in days:
+            print_result(run_day(day, use_cache))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="aoc")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="runs the puzzles of the given days")
+    run_parser.add_argument(
+        "--days",
+        type=parse_days,
+        default=None,
+        help="e.g. 1-8 or 1,3,5, defaults to all days with an input file",
+    )
+    run_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="prints time, calls and peak memory per stage, runs the days one by one",
+    )
+    run_parser.add_argument(
+        "--cprofile", metavar="PATH", help="writes a cProfile file of the whole run"
+    )
+    run_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always parses the inputs instead of loading them from inputs/.cache",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        jobs = args.jobs
+        use_cache = not args.no_cache
+        if args.profile or args.cprofile:
+            # the stats are collected in this process only, and a cached input
+            # would skip the parsers that should be measured
+            jobs = 1
+            use_cache = False
+        if args.profile:
+            enable_profiling()
+
+        with cprofile_to(args.cprofile) if args.cprofile else nullcontext():
+            run(args.days or discover_days(), jobs, use_cache=use_cache)
+
+        if args.profile:
+            print(profiling_report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
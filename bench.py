@@ -0,0 +1,245 @@
+from aoc import parse_days
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+# letters used for generated day_08 node names, A and Z are left out so only
+# the dedicated start and end nodes end with them
+NODE_NAME_LETTERS = "BCDEFGHIJKLMNOPQRSTUVWXY"
+
+
+def generate_day_03(size: int, rng: random.Random) -> str:
+    # size x size schematic
+    rows: list[str] = []
+    for _ in range(size):
+        row: list[str] = []
+        while len(row) < size:
+            r = rng.random()
+            if r < 0.6:
+                row.append(".")
+            elif r < 0.7:
+                row.append(rng.choice("*#+$/=@%-&"))
+            else:
+                row.extend(str(rng.randrange(1, 1000)))
+                row.append(".")
+        rows.append("".join(row[:size]))
+    return "\n".join(rows) + "\n"
+
+
+def generate_day_05(size: int, rng: random.Random) -> str:
+    # size seed ranges, the maps have a fixed amount of ranges
+    span = 4_000_000_000
+    seeds: list[int] = []
+    for _ in range(size):
+        seeds += [rng.randrange(span), rng.randrange(1, 100_000_000)]
+
+    sections = ["seeds: " + " ".join(map(str, seeds))]
+    for name in (
+        "seed-to-soil",
+        "soil-to-fertilizer",
+        "fertilizer-to-water",
+        "water-to-light",
+        "light-to-temperature",
+        "temperature-to-humidity",
+        "humidity-to-location",
+    ):
+        lines = [f"{name} map:"]
+        # non overlapping source ranges
+        cuts = sorted(rng.sample(range(1, span), 64))
+        for start, end in zip(cuts[::2], cuts[1::2]):
+            lines.append(f"{rng.randrange(span)} {start} {end - start}")
+        sections.append("\n".join(lines))
+
+    return "\n\n".join(sections) + "\n"
+
+
+def generate_day_07(size: int, rng: random.Random) -> str:
+    # size hands
+    return "".join(
+        "".join(rng.choices("23456789TJQKA", k=5)) + f" {rng.randrange(1, 1000)}\n"
+        for _ in range(size)
+    )
+
+
+def generate_day_08(size: int, rng: random.Random) -> str:
+    # size nodes. every ghost walks from its start node into its own cycle of
+    # factor * repeats passes of the instructions, both directions lead to the
+    # next node of the cycle and the last one is its end node. so all ghosts
+    # are on an end node together after lcm of the cycle lengths steps. the
+    # nodes left over form a ring no ghost ever gets to
+    instructions = "".join(rng.choices("LR", k=rng.randrange(5, 20)))
+    ghosts = max(1, min(6, size // 64))
+    factors = [rng.randint(1, 3) for _ in range(ghosts)]
+    repeats = (size - ghosts) // (len(instructions) * sum(factors))
+    if repeats == 0:
+        raise ValueError("day 8 needs a size of at least 64")
+
+    width = 3
+    while len(NODE_NAME_LETTERS) ** (width - 1) < size:
+        width += 1
+
+    names: list[str] = []
+    for i in range(size):
+        name = ""
+        for _ in range(width):
+            i, digit = divmod(i, len(NODE_NAME_LETTERS))
+            name = NODE_NAME_LETTERS[digit] + name
+        names.append(name)
+
+    # ghost i starts at node 48 * i and ends at node 48 * i + 24. they are
+    # spaced out, so replacing the last letter keeps the names unique
+    starts = [48 * ghost for ghost in range(ghosts)]
+    ends = [48 * ghost + 24 for ghost in range(ghosts)]
+    for start, end in zip(starts, ends):
+        names[start] = names[start][:-1] + "A"
+        names[end] = names[end][:-1] + "Z"
+    names[starts[0]] = "A" * width
+    names[ends[0]] = "Z" * width
+
+    ghost_nodes = set(starts + ends)
+    pool = [node for node in range(size) if node not in ghost_nodes]
+    rng.shuffle(pool)
+
+    # node -> next node, for left and right alike
+    next_nodes: dict[int, int] = {}
+    for start, end, factor in zip(starts, ends, factors):
+        cycle_length = factor * repeats * len(instructions)
+        cycle = pool[: cycle_length - 1] + [end]
+        del pool[: cycle_length - 1]
+        next_nodes[start] = cycle[0]
+        for node, next_node in zip(cycle, cycle[1:] + cycle[:1]):
+            next_nodes[node] = next_node
+    for node, next_node in zip(pool, pool[1:] + pool[:1]):
+        next_nodes[node] = next_node
+
+    nodes = list(range(size))
+    rng.shuffle(nodes)
+    lines = [
+        f"{names[node]} = ({names[next_nodes[node]]}, {names[next_nodes[node]]})"
+        for node in nodes
+    ]
+    return instructions + "\n\n" + "\n".join(lines) + "\n"
+
+
+GENERATORS: dict[int, Callable[[int, random.Random], str]] = {
+    3: generate_day_03,
+    5: generate_day_05,
+    7: generate_day_07,
+    8: generate_day_08,
+}
+
+# items a generated input of the given size has, used for the throughput
+GENERATED_ITEMS: dict[int, Callable[[int], int]] = {
+    3: lambda size: size * size,
+}
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    day: int
+    size: int
+    stage: str
+    items: int
+    seconds: float
+    items_per_second: float
+    peak_memory_bytes: int
+
+
+def measure(
+    func: Callable[[Any], Any], arg: Any, repeat: int
+) -> tuple[Any, float, int]:
+    # best of repeat runs for the time, one extra traced run for the memory as
+    # tracemalloc slows everything down
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, best, peak
+
+
+def run_benchmark(
+    days: list[int], sizes: list[int], seed: int, repeat: int
+) -> list[BenchmarkResult]:
+    results: list[BenchmarkResult] = []
+    for day in days:
+        module = importlib.import_module(f"day_{str(day).rjust(2, '0')}")
+        for size in sizes:
+            text = GENERATORS[day](size, random.Random(seed))
+            items = GENERATED_ITEMS.get(day, lambda size: size)(size)
+            parsed, *_ = measure(module.parse, text, 1)
+            for stage, func, arg in (
+                ("parse", module.parse, text),
+                ("puzzle_1", module.puzzle_1, parsed),
+                ("puzzle_2", module.puzzle_2, parsed),
+            ):
+                answer, seconds, peak = measure(func, arg, repeat)
+                # a missing answer means the generated input has no solution
+                assert answer is not None, f"day {day} {stage} has no answer"
+                result = BenchmarkResult(
+                    day=day,
+                    size=size,
+                    stage=stage,
+                    items=items,
+                    seconds=seconds,
+                    items_per_second=items / seconds if seconds else float("inf"),
+                    peak_memory_bytes=peak,
+                )
+                print(
+                    f"Day {str(day).rjust(2, '0')} size {size:>9} {stage:<8} "
+                    f"{seconds * 1000:>10.2f} ms {result.items_per_second:>14,.0f} items/s "
+                    f"{peak / 2**20:>9.2f} MiB"
+                )
+                results.append(result)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="bench")
+    parser.add_argument(
+        "--days",
+        type=parse_days,
+        default=sorted(GENERATORS),
+        help=f"days with a generator: {', '.join(map(str, GENERATORS))}",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--seed", type=int, default=2023)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="writes the results as json to this file")
+    args = parser.parse_args()
+
+    unknown_days = set(args.days) - set(GENERATORS)
+    if unknown_days:
+        parser.error(f"no generator for day(s) {sorted(unknown_days)}")
+
+    results = run_benchmark(args.days, args.sizes, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(
+                {
+                    "created_at": datetime.datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "seed": args.seed,
+                    "results": [asdict(result) for result in results],
+                },
+                fp,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-from utils import get_input
+from utils import iter_input_lines, instrument, map_input
+from collections import deque
+from typing import Iterable
+import argparse
 import re
 
+PARSER_VERSION = 1
+CACHE_PARSED = False
+
 NUMBERS = {
     "one": "1",
     "two": "2",
@@ -13,43 +19,134 @@ NUMBERS = {
     "nine": "9",
 }
 
+# bytes per chunk when the input is processed in bulk, chunks end at a newline
+CHUNK_SIZE = 1 << 24
+# everything but the digits 1 to 9 and newlines, removed before looking at the
+# lines. 0 is not a valid digit in the calibration values
+NON_DIGIT_BYTES = bytes(c for c in range(256) if not 49 <= c <= 57 and c != 10)
+FIRST_DIGIT_PATTERN = re.compile(rb"^[1-9]", re.MULTILINE)
+LAST_DIGIT_PATTERN = re.compile(rb"[1-9]$", re.MULTILINE)
 
-def puzzle_1(lines: list[str]):
-    pattern_string = "|".join(n for n in NUMBERS.values())
-    pattern = re.compile(pattern_string)
-    matches = [re.findall(pattern, lines) for lines in lines]
-    return sum(int(match[0] + match[-1]) for match in matches)
 
+def digit_sum(digits: bytes) -> int:
+    # the ascii digits are the bytes 48 to 57
+    return sum(digits) - 48 * len(digits)
 
-def puzzle_2(lines: list[str]):
-    # re does not work because of overlapping strings, e.g. twone = two and one
-    # pattern_string = "|".join([str(n) for n in NUMBERS.values()] + list(NUMBERS.keys()))
-    # pattern = re.compile(f"{pattern_string}")
-    patterns_to_find = [str(n) for n in NUMBERS.values()] + list(NUMBERS.keys())
 
-    sum = 0
-    for line in lines:
-        # matches = re.findall(pattern, line)
-        # runs very fast x)
+def calibration_sum(data: bytes) -> int:
+    # once only the digits are left, the first and last digit of a line are
+    # at its start and end. the matches are single bytes, which python does
+    # not allocate, so no object is created per line
+    digits = data.translate(None, NON_DIGIT_BYTES)
+    firsts = b"".join(FIRST_DIGIT_PATTERN.findall(digits))
+    lasts = b"".join(LAST_DIGIT_PATTERN.findall(digits))
+    return 10 * digit_sum(firsts) + digit_sum(lasts)
+
+
+@instrument
+def calibration_sum_of_input(chunk_size: int = CHUNK_SIZE) -> int:
+    total = 0
+    with map_input(1) as data:
+        start = 0
+        while start < len(data):
+            end = data.find(b"\n", start + chunk_size)
+            end = len(data) if end == -1 else end + 1
+            total += calibration_sum(data[start:end])
+            start = end
+    return total
+
+
+class PatternMatcher:
+    # aho-corasick automaton, finds all (also overlapping) patterns in one pass
+    def __init__(self, patterns: dict[str, str]) -> None:
+        # state -> char -> next state, filled in for every char of the patterns
+        # so a step is a single dict lookup. unknown chars go back to state 0
+        self.transitions: list[dict[str, int]] = [{}]
+        # state -> values of the patterns ending in that state, longest first
+        self.outputs: list[list[str]] = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.outputs.append([])
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.outputs[state].append(value)
+
+        alphabet = set("".join(patterns))
+        fail = [0] * len(self.transitions)
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            self.outputs[state].extend(self.outputs[fail[state]])
+            for char in alphabet:
+                if char in self.transitions[state]:
+                    next_state = self.transitions[state][char]
+                    fail[next_state] = self.transitions[fail[state]].get(char, 0)
+                    queue.append(next_state)
+                else:
+                    self.transitions[state][char] = self.transitions[fail[state]].get(
+                        char, 0
+                    )
+
+    def find_all(self, text: Iterable[str]) -> list[str]:
+        transitions = self.transitions
+        outputs = self.outputs
         matches = []
-        for i in range(len(line)):
-            for pattern in patterns_to_find:
-                if line[i:].startswith(pattern):
-                    matches.append(pattern)
-
-        start: str = matches[0]
-        end: str = matches[-1]
-        if not start.isdigit():
-            start = NUMBERS[start]
-        if not end.isdigit():
-            end = NUMBERS[end]
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            matches.extend(outputs[state])
+        return matches
+
+    def find_first(self, text: Iterable[str]) -> str | None:
+        # the first pattern to end is also the first one to start, as long as
+        # no pattern contains another one (true for NUMBERS)
+        transitions = self.transitions
+        outputs = self.outputs
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                return outputs[state][0]
+        return None
 
+
+DIGIT_PATTERNS = {value: value for value in NUMBERS.values()}
+FORWARD_MATCHER = PatternMatcher(DIGIT_PATTERNS | NUMBERS)
+# matches the reversed patterns, used to find the last match from the right
+BACKWARD_MATCHER = PatternMatcher(
+    DIGIT_PATTERNS | {word[::-1]: value for word, value in NUMBERS.items()}
+)
+
+
+@instrument
+def parse(text: str) -> list[str]:
+    return [row.strip() for row in text.splitlines()]
+
+
+@instrument
+def puzzle_1(lines: Iterable[str]):
+    return calibration_sum("\n".join(lines).encode())
+
+
+@instrument
+def puzzle_2(lines: Iterable[str]):
+    sum = 0
+    for line in lines:
+        start = FORWARD_MATCHER.find_first(line)
+        end = BACKWARD_MATCHER.find_first(reversed(line))
         sum += int(start + end)
 
     return sum
 
 
 if __name__ == "__main__":
-    lines = [row.strip() for row in get_input(1).splitlines()]
-    print(puzzle_1(lines))
-    print(puzzle_2(lines))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(calibration_sum_of_input(args.chunk_size))
+    print(puzzle_2(row.strip() for row in iter_input_lines(1)))
@@ -1,8 +1,16 @@
-from utils import get_input
-from dataclasses import dataclass
+from utils import iter_input_lines, instrument
+from tokenizer import chunks, fields
+from typing import Iterable
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain, compress, repeat
+from operator import and_, le, mul
 import enum
-from functools import reduce
+
+PARSER_VERSION = 2
+CACHE_PARSED = True
 
 
 class CubeColor(enum.IntEnum):
@@ -10,69 +18,181 @@ class CubeColor(enum.IntEnum):
     GREEN = enum.auto()
     BLUE = enum.auto()
 
-    @classmethod
-    def from_string(cls, color: str):
-        return cls[color.upper()]
 
+# color name -> index in the max vector of a game
+COLOR_SLOTS = {color.name.lower(): color - 1 for color in CubeColor}
+# batches up to this size are answered with a scan per bag
+SCAN_BAGS_LIMIT = 100
+
+
+class Fenwick2D:
+    # prefix sums over a fixed set of (row, col) points with point updates, both
+    # in O(log rows * log cols). every row node only keeps the cols of the
+    # points that can end up in it, so the memory grows with
+    # points * log(rows) and not with rows * cols
+    def __init__(self, rows: int, points: Iterable[tuple[int, int]]) -> None:
+        node_cols: list[set[int]] = [set() for _ in range(rows + 1)]
+        for row, col in points:
+            while row <= rows:
+                node_cols[row].add(col)
+                row += row & -row
+
+        self.cols = [sorted(cols) for cols in node_cols]
+        self.trees = [[0] * (len(cols) + 1) for cols in self.cols]
+
+    def add(self, row: int, col: int, value: int) -> None:
+        # row is 1-based, (row, col) has to be one of the points
+        while row < len(self.trees):
+            tree = self.trees[row]
+            c = bisect_left(self.cols[row], col) + 1
+            while c < len(tree):
+                tree[c] += value
+                c += c & -c
+            row += row & -row
+
+    def prefix_sum(self, row: int, col: int) -> int:
+        # sum over all points <= (row, col), col can be any value
+        total = 0
+        while row > 0:
+            tree = self.trees[row]
+            c = bisect_right(self.cols[row], col)
+            while c > 0:
+                total += tree[c]
+                c -= c & -c
+            row -= row & -row
+        return total
+
+
+@dataclass(frozen=True)
+class GameLog:
+    ids: array
+    # max amount of red, green and blue cubes per game, a flattened (games, 3)
+    # matrix
+    maxima: array
 
-@dataclass
-class Game:
-    id: int
-    sets: list[list[tuple[int, CubeColor]]]
+    @classmethod
+    @instrument
+    def from_lines(cls, lines: Iterable[str]):
+        # streams the log, tokenized the same way as from_input
+        return cls._from_pairs(
+            chain.from_iterable(chunks(fields(line, ":;,"), 2) for line in lines)
+        )
 
     @classmethod
-    def from_line(cls, line: str):
-        id_part, games_part = line.split(":")
-        id = int(id_part.split(" ")[-1])
-
-        sets = []
-        for set_string in games_part.split(";"):
-            ball_picks = []
-            for pick in set_string.split(","):
-                amount_string, color_string = pick.strip().split(" ")
-                amount = int(amount_string)
-                color = CubeColor.from_string(color_string)
-                ball_picks.append((amount, color))
-            sets.append(ball_picks)
-
-        return cls(id=id, sets=sets)
-
-
-def puzzle_1(games: list[Game]):
-    possible_games: list[Game] = []
-    for game in games:
-        max_cube_color_count: dict[CubeColor, int] = defaultdict(int)
-        for set_ in game.sets:
-            for amount, color in set_:
-                if amount > max_cube_color_count[color]:
-                    max_cube_color_count[color] = amount
-
-        is_possible = (
-            max_cube_color_count[CubeColor.RED] <= 12
-            and max_cube_color_count[CubeColor.GREEN] <= 13
-            and max_cube_color_count[CubeColor.BLUE] <= 14
+    @instrument
+    def from_input(cls, text: str):
+        return cls._from_pairs(chunks(fields(text, ":;,"), 2))
+
+    @classmethod
+    def _from_pairs(cls, pairs: Iterable[tuple[str, str]]):
+        # the log is a sequence of pairs, "Game" and an id or an amount and a
+        # color
+        ids = array("I")
+        maxima = array("I")
+        # maxima of the game that is currently being read
+        max_vector: list[int] = []
+        for key, value in pairs:
+            if key == "Game":
+                maxima.extend(max_vector)
+                ids.append(int(value))
+                max_vector = [0, 0, 0]
+            elif int(key) > max_vector[COLOR_SLOTS[value]]:
+                max_vector[COLOR_SLOTS[value]] = int(key)
+        maxima.extend(max_vector)
+
+        return cls(ids=ids, maxima=maxima)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def color_maxima(self, color: CubeColor) -> array:
+        # column of the maxima matrix
+        return self.maxima[color - 1 :: 3]
+
+    def feasible_id_sum(self, red: int, green: int, blue: int) -> int:
+        # sum of the ids of all games that are possible with the given bag
+        is_possible = map(
+            and_,
+            map(
+                and_,
+                map(le, self.color_maxima(CubeColor.RED), repeat(red)),
+                map(le, self.color_maxima(CubeColor.GREEN), repeat(green)),
+            ),
+            map(le, self.color_maxima(CubeColor.BLUE), repeat(blue)),
+        )
+        return sum(compress(self.ids, is_possible))
+
+    def feasible_id_sums(self, bags: list[tuple[int, int, int]]) -> list[int]:
+        # feasible_id_sum for a batch of (red, green, blue) bags at once. games
+        # with the same maxima are merged, then the bags are answered in order
+        # of red while the games with few enough red cubes are added to a
+        # fenwick tree over green and blue, so a bag costs O(log^2) instead of
+        # a scan over all games. building the tree costs about as much as
+        # SCAN_BAGS_LIMIT scans, so small batches are just scanned
+        if len(bags) <= SCAN_BAGS_LIMIT:
+            return [self.feasible_id_sum(*bag) for bag in bags]
+
+        id_sums: dict[tuple[int, int, int], int] = defaultdict(int)
+        for id_, red, green, blue in zip(
+            self.ids,
+            self.color_maxima(CubeColor.RED),
+            self.color_maxima(CubeColor.GREEN),
+            self.color_maxima(CubeColor.BLUE),
+        ):
+            id_sums[(red, green, blue)] += id_
+
+        # games with more red cubes than any bag are never added
+        max_red = max(red for red, _, _ in bags)
+        games = sorted(item for item in id_sums.items() if item[0][0] <= max_red)
+        greens = sorted({green for (_, green, _), _ in games})
+        tree = Fenwick2D(
+            len(greens),
+            ((bisect_left(greens, green) + 1, blue) for (_, green, blue), _ in games),
+        )
+
+        results = [0] * len(bags)
+        next_game = 0
+        for bag_idx in sorted(range(len(bags)), key=lambda idx: bags[idx][0]):
+            red, green, blue = bags[bag_idx]
+            while next_game < len(games) and games[next_game][0][0] <= red:
+                (_, game_green, game_blue), id_sum = games[next_game]
+                tree.add(bisect_left(greens, game_green) + 1, game_blue, id_sum)
+                next_game += 1
+
+            results[bag_idx] = tree.prefix_sum(bisect_right(greens, green), blue)
+
+        return results
+
+    def power_sum(self) -> int:
+        return sum(
+            map(
+                mul,
+                map(
+                    mul,
+                    self.color_maxima(CubeColor.RED),
+                    self.color_maxima(CubeColor.GREEN),
+                ),
+                self.color_maxima(CubeColor.BLUE),
+            )
         )
-        if is_possible:
-            possible_games.append(game)
 
-    return sum(game.id for game in possible_games)
 
+@instrument
+def parse(text: str) -> GameLog:
+    return GameLog.from_input(text)
+
+
+@instrument
+def puzzle_1(game_log: GameLog):
+    return game_log.feasible_id_sum(red=12, green=13, blue=14)
 
-def puzzle_2(games: list[Game]):
-    total_power = 0
-    for game in games:
-        max_cube_color_count: dict[CubeColor, int] = defaultdict(int)
-        for set_ in game.sets:
-            for amount, color in set_:
-                if amount > max_cube_color_count[color]:
-                    max_cube_color_count[color] = amount
 
-        power = reduce(lambda x, y: x * y, max_cube_color_count.values())
-        total_power += power
-    return total_power
+@instrument
+def puzzle_2(game_log: GameLog):
+    return game_log.power_sum()
 
 
 if __name__ == "__main__":
-    games = [Game.from_line(line) for line in get_input(2).splitlines()]
-    print(puzzle_1(games))
-    print(puzzle_2(games))
+    game_log = GameLog.from_lines(iter_input_lines(2))
+    print(puzzle_1(game_log))
+    print(puzzle_2(game_log))
@@ -1,70 +1,101 @@
-from utils import get_input
+from utils import get_input, instrument
 from dataclasses import dataclass
 import re
 from collections import defaultdict
 
+PARSER_VERSION = 1
+CACHE_PARSED = False
 
-@dataclass(frozen=True)
-class Pos:
-    x: int
-    y: int
-
-    def __eq__(self, other: "Pos") -> bool:
-        return self.x == other.x and self.y == other.y
+# maps every byte of the grid to 1 if it is a symbol, else 0
+SYMBOL_TABLE = bytes(0 if chr(c) in "0123456789.\n" else 1 for c in range(256))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PartNumber:
     value: int
-    start_pos: Pos
-    end_pos: Pos
-
-    def get_surrounding_positions(self) -> set[Pos]:
-        surrounding_positions: set[Pos] = set()
-        surrounding_positions.update(
-            [
-                Pos(x=x, y=self.start_pos.y - 1)
-                for x in range(self.start_pos.x - 1, self.end_pos.x + 2)
-            ]
-        )
-        surrounding_positions.update(
-            [
-                Pos(x=x, y=self.start_pos.y + 1)
-                for x in range(self.start_pos.x - 1, self.end_pos.x + 2)
-            ]
-        )
-        surrounding_positions.add(Pos(x=self.start_pos.x - 1, y=self.start_pos.y))
-        surrounding_positions.add(Pos(x=self.end_pos.x + 1, y=self.start_pos.y))
-
-        return surrounding_positions
+    offset: int  # index of the first digit in Schematic.grid
+    length: int
 
 
 @dataclass(frozen=True)
-class Symbol:
-    pos: Pos
-    symbol: str
-
-
-def puzzle_1(part_numbers: list[PartNumber], symbols: list[Symbol]):
-    sum = 0
-    for part_number in part_numbers:
-        if any(
-            symbol.pos in part_number.get_surrounding_positions() for symbol in symbols
-        ):
-            sum += part_number.value
-
-    return sum
+class Schematic:
+    # all rows terminated by a newline, so cell (x, y) is grid[y * stride + x]
+    # and the newline column separates the rows from each other
+    grid: bytes
+    stride: int
+    part_numbers: list[PartNumber]
+
+    @classmethod
+    @instrument
+    def from_input(cls, text: str):
+        lines = text.splitlines()
+        grid = "".join(line + "\n" for line in lines).encode()
+        stride = len(lines[0]) + 1 if lines else 1
+
+        part_numbers = [
+            PartNumber(
+                value=int(match.group()),
+                offset=match.start(),
+                length=match.end() - match.start(),
+            )
+            for match in re.finditer(rb"\d+", grid)
+        ]
+
+        return cls(grid=grid, stride=stride, part_numbers=part_numbers)
+
+    def symbol_mask(self) -> bytes:
+        return self.grid.translate(SYMBOL_TABLE)
+
+    def dilated_symbol_mask(self) -> bytes:
+        # marks every cell next to a symbol. the mask is shifted as one big int,
+        # one byte is one cell and stride bytes are one row. horizontal shifts
+        # at the row edges only reach the newline column, so nothing wraps
+        size = len(self.grid)
+        mask = int.from_bytes(self.symbol_mask(), "little")
+        mask |= (mask << 8) | (mask >> 8)
+        row_shift = 8 * self.stride
+        mask |= (mask << row_shift) | (mask >> row_shift)
+        return mask.to_bytes(size + self.stride + 1, "little")[:size]
+
+    def adjacent_gears(self, part_number: PartNumber) -> list[int]:
+        gears: list[int] = []
+        for row_offset in (-self.stride, 0, self.stride):
+            # border cells of the part in the row above, the same row and below
+            start = max(part_number.offset + row_offset - 1, 0)
+            end = max(part_number.offset + row_offset + part_number.length + 1, 0)
+            idx = self.grid.find(b"*", start, end)
+            while idx != -1:
+                gears.append(idx)
+                idx = self.grid.find(b"*", idx + 1, end)
+
+        return gears
+
+
+@instrument
+def parse(text: str) -> Schematic:
+    return Schematic.from_input(text)
+
+
+@instrument
+def puzzle_1(schematic: Schematic):
+    adjacent_mask = schematic.dilated_symbol_mask()
+    return sum(
+        part_number.value
+        for part_number in schematic.part_numbers
+        if adjacent_mask.find(
+            1, part_number.offset, part_number.offset + part_number.length
+        )
+        != -1
+    )
 
 
-def puzzle_2(part_numbers: list[PartNumber], symbols: list[Symbol]):
-    gear_symbols = list(filter(lambda s: s.symbol == "*", symbols))
-    gears_to_matching_part_nums: dict[Symbol, list[PartNumber]] = defaultdict(list)
+@instrument
+def puzzle_2(schematic: Schematic):
+    gears_to_matching_part_nums: dict[int, list[PartNumber]] = defaultdict(list)
 
-    for part_number in part_numbers:
-        surrounding_positions = part_number.get_surrounding_positions()
-        for symbol in gear_symbols:
-            if symbol.pos in surrounding_positions:
-                gears_to_matching_part_nums[symbol].append(part_number)
+    for part_number in schematic.part_numbers:
+        for gear in schematic.adjacent_gears(part_number):
+            gears_to_matching_part_nums[gear].append(part_number)
 
     sum = 0
     for matching_part_numbers in gears_to_matching_part_nums.values():
@@ -75,23 +106,6 @@ def puzzle_2(part_numbers: list[PartNumber], symbols: list[Symbol]):
 
 
 if __name__ == "__main__":
-    symbols: list[Symbol] = []
-    part_numbers: list[PartNumber] = []
-
-    pattern = re.compile(r"(\d+)|([^.])")
-    for row, line in enumerate(get_input(3).splitlines()):
-        for match in pattern.finditer(line):
-            value = match.group()
-            if value.isdigit():
-                part_numbers.append(
-                    PartNumber(
-                        value=int(value),
-                        start_pos=Pos(x=match.start(), y=row),
-                        end_pos=Pos(x=match.end() - 1, y=row),
-                    )
-                )
-            else:
-                symbols.append(Symbol(symbol=value, pos=Pos(x=match.start(), y=row)))
-
-    print(puzzle_1(part_numbers, symbols))
-    print(puzzle_2(part_numbers, symbols))
+    schematic = parse(get_input(3))
+    print(puzzle_1(schematic))
+    print(puzzle_2(schematic))
@@ -1,32 +1,39 @@
-from utils import get_input
+from utils import iter_input_lines, instrument
+from tokenizer import chunks, ints
+from typing import Iterable
 from dataclasses import dataclass
 from collections import deque
-from functools import cache
+
+PARSER_VERSION = 1
+CACHE_PARSED = True
+
+
+def to_bitmask(numbers: Iterable[int]) -> int:
+    mask = 0
+    for num in numbers:
+        mask |= 1 << num
+    return mask
 
 
 @dataclass(frozen=True)
 class Scratchcard:
     idx: int
-    winning_numbers: tuple[int]
-    owning_numbers: tuple[int]
+    # bit n is set if the number n is on the card
+    winning_mask: int
+    owning_mask: int
 
     @classmethod
+    @instrument
     def from_line(cls, idx: int, line: str):
         _, num_part = line.split(": ")
         wn_part, on_part = num_part.split("|")
-        wn_numbers = tuple(int(j) for j in wn_part.strip().split(" ") if j)
-        on_numbers = tuple(int(j) for j in on_part.strip().split(" ") if j)
+        wn_mask = to_bitmask(ints(wn_part))
+        on_mask = to_bitmask(ints(on_part))
 
-        return cls(idx=idx, winning_numbers=wn_numbers, owning_numbers=on_numbers)
+        return cls(idx=idx, winning_mask=wn_mask, owning_mask=on_mask)
 
-    @cache  # mvp carry
     def calculate_winning_cards_count(self) -> int:
-        count = 0
-        for num in set(self.owning_numbers):
-            if num in self.winning_numbers:
-                count += self.owning_numbers.count(num)
-
-        return count
+        return (self.winning_mask & self.owning_mask).bit_count()
 
     def calculate_score(self) -> int:
         winning_count = self.calculate_winning_cards_count()
@@ -36,33 +43,58 @@ class Scratchcard:
         return 2 ** (winning_count - 1)
 
 
-def puzzle_1(scratchcards: list[Scratchcard]) -> int:
+@instrument
+def parse(text: str) -> list[Scratchcard]:
+    # all cards have the same layout, so the numbers of the whole input are
+    # cut into rows of card id, winning numbers and owned numbers
+    first_line = text.partition("\n")[0]
+    winning_count = len(ints(first_line.partition("|")[0])) - 1
+    row_size = len(ints(first_line))
+    return [
+        Scratchcard(
+            idx=idx,
+            winning_mask=to_bitmask(row[1 : 1 + winning_count]),
+            owning_mask=to_bitmask(row[1 + winning_count :]),
+        )
+        for idx, row in enumerate(chunks(ints(text), row_size))
+    ]
+
+
+@instrument
+def puzzle_1(scratchcards: Iterable[Scratchcard]) -> int:
     return sum(scratchcard.calculate_score() for scratchcard in scratchcards)
 
 
-def puzzle_2(scratchcards: list[Scratchcard]) -> int:
-    processing = deque(scratchcards)
-    count = len(scratchcards)
-    # not quite the fastest, but it works x)
-    # better approch would probably be to cache the result for the whole chain deep down
-    # no idea tho
-    while processing:
-        current_card = processing.popleft()
-        winning_cards_count = current_card.calculate_winning_cards_count()
-        new_cards = scratchcards[
-            current_card.idx + 1 : current_card.idx + winning_cards_count + 1
-        ]
-        count += len(new_cards)
-        processing.extend(new_cards)
+@instrument
+def puzzle_2(scratchcards: Iterable[Scratchcard]) -> int:
+    # extra copies won for the upcoming cards, index 0 is the next card. a card
+    # can only win copies of the cards right after it, so this never gets
+    # longer than the highest winning count
+    pending_copies: deque[int] = deque()
+    count = 0
+    for scratchcard in scratchcards:
+        copies = 1 + (pending_copies.popleft() if pending_copies else 0)
+        count += copies
+
+        winning_cards_count = scratchcard.calculate_winning_cards_count()
+        if len(pending_copies) < winning_cards_count:
+            pending_copies.extend([0] * (winning_cards_count - len(pending_copies)))
+        for i in range(winning_cards_count):
+            pending_copies[i] += copies
 
     return count
 
 
 if __name__ == "__main__":
-    scratchcards = [
-        Scratchcard.from_line(idx, line)
-        for idx, line in enumerate(get_input(4).splitlines())
-    ]
-
-    print(puzzle_1(scratchcards))
-    print(puzzle_2(scratchcards))
+    print(
+        puzzle_1(
+            Scratchcard.from_line(idx, line)
+            for idx, line in enumerate(iter_input_lines(4))
+        )
+    )
+    print(
+        puzzle_2(
+            Scratchcard.from_line(idx, line)
+            for idx, line in enumerate(iter_input_lines(4))
+        )
+    )
@@ -1,8 +1,29 @@
-from utils import get_input
-from dataclasses import dataclass
+from utils import get_input, CacheStats, LRUCache, instrument
+from tokenizer import chunks, ints
+from dataclasses import dataclass, field, fields
+from functools import cached_property
 from itertools import chain
-from functools import cache
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import sys
+import time
+from bisect import bisect_right
+from typing import Iterable
+import math
+
+PARSER_VERSION = 1
+CACHE_PARSED = True
+
+# half-open [start, end) interval of values
+Interval = tuple[int, int]
+# half-open [start, end) interval of values which get shifted by offset
+Segment = tuple[int, int | float, int]
+
+# caching only pays off when the same values get converted again, e.g. for
+# overlapping seed ranges, so the cache is capped to keep memory bounded
+CACHE_MAXSIZE = 2**16
+# seeds per shard when scanning the seed ranges with multiple processes
+CHUNK_SIZE = 1_000_000
 
 
 @dataclass(frozen=True)
@@ -13,45 +34,160 @@ class Range:
 
     @classmethod
     def from_line(cls, line: str):
-        nums = [int(j) for j in line.split(" ") if j]
+        nums = ints(line)
         return cls(
             destination_range_start=nums[0],
             source_range_start=nums[1],
             range_length=nums[2],
         )
 
-    @cache
+    @property
+    def source_range_end(self) -> int:
+        return self.source_range_start + self.range_length
+
     def check_in_source_range(self, value: int) -> bool:
         return value >= self.source_range_start and value < (
             self.source_range_start + self.range_length
         )
 
-    @cache
     def calculate_destination(self, value: int) -> int:
         offset = value - self.source_range_start
         return self.destination_range_start + offset
 
+    def split_interval(
+        self, interval: Interval
+    ) -> tuple[Interval | None, list[Interval]]:
+        # returns the converted overlapping part (if any) and the parts of the
+        # interval that are not covered by this range
+        start, end = interval
+        overlap_start = max(start, self.source_range_start)
+        overlap_end = min(end, self.source_range_end)
+        if overlap_start >= overlap_end:
+            return None, [interval]
+
+        leftovers: list[Interval] = []
+        if start < overlap_start:
+            leftovers.append((start, overlap_start))
+        if overlap_end < end:
+            leftovers.append((overlap_end, end))
+
+        offset = self.destination_range_start - self.source_range_start
+        return (overlap_start + offset, overlap_end + offset), leftovers
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    merged: list[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
 
 @dataclass(frozen=True)
 class Map:
     ranges: tuple[Range, ...]
+    cache: LRUCache[int, int] = field(
+        default_factory=lambda: LRUCache(CACHE_MAXSIZE),
+        compare=False,
+        repr=False,
+    )
 
     @classmethod
-    def from_section(cls, section: str):
-        ranges = []
-        for line in section.splitlines()[1:]:
-            ranges.append(Range.from_line(line))
+    def from_section(cls, section: str, cache_maxsize: int | None = CACHE_MAXSIZE):
+        # skips the header, every range is a triple of numbers
+        _, _, body = section.partition("\n")
+        ranges = tuple(
+            Range(
+                destination_range_start=destination_start,
+                source_range_start=source_start,
+                range_length=length,
+            )
+            for destination_start, source_start, length in chunks(ints(body), 3)
+        )
 
-        return cls(ranges=tuple(ranges))
+        return cls(ranges=ranges, cache=LRUCache(cache_maxsize))
 
-    @cache
     def convert(self, value: int) -> int:
+        return self.cache.get_or_compute(value, self._convert)
+
+    def _convert(self, value: int) -> int:
         for range_ in self.ranges:
             if range_.check_in_source_range(value):
                 return range_.calculate_destination(value)
 
         return value
 
+    def convert_intervals(self, intervals: list[Interval]) -> list[Interval]:
+        converted: list[Interval] = []
+        pending = intervals
+        for range_ in self.ranges:
+            unmatched: list[Interval] = []
+            for interval in pending:
+                mapped, leftovers = range_.split_interval(interval)
+                if mapped is not None:
+                    converted.append(mapped)
+                unmatched.extend(leftovers)
+            pending = unmatched
+
+        # values not covered by any range map to themselves
+        return merge_intervals(converted + pending)
+
+    def segments(self) -> list[Segment]:
+        # splits [0, inf) into sorted segments, the first matching range wins
+        # just like in convert
+        segments: list[Segment] = []
+        pending: list[Segment] = [(0, math.inf, 0)]
+        for range_ in self.ranges:
+            offset = range_.destination_range_start - range_.source_range_start
+            unmatched: list[Segment] = []
+            for start, end, _ in pending:
+                overlap_start = max(start, range_.source_range_start)
+                overlap_end = min(end, range_.source_range_end)
+                if overlap_start >= overlap_end:
+                    unmatched.append((start, end, 0))
+                    continue
+
+                segments.append((overlap_start, overlap_end, offset))
+                if start < overlap_start:
+                    unmatched.append((start, overlap_start, 0))
+                if overlap_end < end:
+                    unmatched.append((overlap_end, end, 0))
+            pending = unmatched
+
+        return sorted(segments + pending)
+
+
+@dataclass(frozen=True)
+class ComposedMap:
+    # segment i shifts the values in [starts[i], starts[i + 1]) by offsets[i],
+    # the last segment is unbounded and always has an offset of 0
+    starts: tuple[int, ...]
+    offsets: tuple[int, ...]
+
+    @classmethod
+    def from_segments(cls, segments: list[Segment]):
+        starts: list[int] = []
+        offsets: list[int] = []
+        for start, _, offset in segments:
+            if offsets and offsets[-1] == offset:
+                continue
+            starts.append(start)
+            offsets.append(offset)
+
+        return cls(starts=tuple(starts), offsets=tuple(offsets))
+
+    def convert(self, value: int) -> int:
+        # negative values end up at index -1, which is the identity segment
+        return value + self.offsets[bisect_right(self.starts, value) - 1]
+
+    def convert_many(self, values: Iterable[int]) -> list[int]:
+        starts = self.starts
+        offsets = self.offsets
+        return [value + offsets[bisect_right(starts, value) - 1] for value in values]
+
 
 @dataclass(frozen=True)
 class Almanac:
@@ -65,7 +201,8 @@ class Almanac:
     humidity_to_location_map: Map
 
     @classmethod
-    def from_input(cls, text: str) -> None:
+    @instrument
+    def from_input(cls, text: str, cache_maxsize: int | None = CACHE_MAXSIZE):
         (
             seeds_section,
             seed_to_soil_section,
@@ -77,65 +214,215 @@ class Almanac:
             humidity_to_location_section,
         ) = text.split("\n\n")
 
-        seeds = [int(j) for j in seeds_section.split(": ")[1].split(" ") if j]
+        seeds = ints(seeds_section)
 
         return cls(
             seeds=seeds,
-            seed_to_soil_map=Map.from_section(seed_to_soil_section),
-            soil_to_fertilizer_map=Map.from_section(soil_to_fertilizer_section),
-            fertilizer_to_water_map=Map.from_section(fertilizer_to_water_section),
-            water_to_light_map=Map.from_section(water_to_light_section),
-            light_to_temperature_map=Map.from_section(light_to_temperature_section),
+            seed_to_soil_map=Map.from_section(seed_to_soil_section, cache_maxsize),
+            soil_to_fertilizer_map=Map.from_section(
+                soil_to_fertilizer_section, cache_maxsize
+            ),
+            fertilizer_to_water_map=Map.from_section(
+                fertilizer_to_water_section, cache_maxsize
+            ),
+            water_to_light_map=Map.from_section(water_to_light_section, cache_maxsize),
+            light_to_temperature_map=Map.from_section(
+                light_to_temperature_section, cache_maxsize
+            ),
             temperature_to_humidity_map=Map.from_section(
-                temperature_to_humidity_section
+                temperature_to_humidity_section, cache_maxsize
+            ),
+            humidity_to_location_map=Map.from_section(
+                humidity_to_location_section, cache_maxsize
             ),
-            humidity_to_location_map=Map.from_section(humidity_to_location_section),
         )
 
+    @property
+    def named_maps(self) -> dict[str, Map]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.type is Map}
 
-def puzzle_1(almanac: Almanac) -> int:
-    min_ = sys.maxsize
+    @property
+    def maps(self) -> tuple[Map, ...]:
+        return (
+            self.seed_to_soil_map,
+            self.soil_to_fertilizer_map,
+            self.fertilizer_to_water_map,
+            self.water_to_light_map,
+            self.light_to_temperature_map,
+            self.temperature_to_humidity_map,
+            self.humidity_to_location_map,
+        )
 
-    for seed in almanac.seeds:
-        soil = almanac.seed_to_soil_map.convert(seed)
-        fertilizer = almanac.soil_to_fertilizer_map.convert(soil)
-        water = almanac.fertilizer_to_water_map.convert(fertilizer)
-        light = almanac.water_to_light_map.convert(water)
-        temperature = almanac.light_to_temperature_map.convert(light)
-        humidity = almanac.temperature_to_humidity_map.convert(temperature)
-        location = almanac.humidity_to_location_map.convert(humidity)
+    def seed_intervals(self) -> list[Interval]:
+        return [
+            (start, start + length)
+            for start, length in zip(self.seeds[::2], self.seeds[1::2])
+            if length
+        ]
 
-        if location < min_:
-            min_ = location
+    def cache_stats(self) -> dict[str, CacheStats]:
+        return {name: map_.cache.stats for name, map_ in self.named_maps.items()}
 
-    return min_
+    def convert(self, seed: int) -> int:
+        value = seed
+        for map_ in self.maps:
+            value = map_.convert(value)
+        return value
 
+    def convert_intervals(self, intervals: list[Interval]) -> list[Interval]:
+        for map_ in self.maps:
+            intervals = map_.convert_intervals(intervals)
+        return intervals
 
-def puzzle_2(almanac: Almanac) -> int:
-    min_ = sys.maxsize
+    def compose(self) -> ComposedMap:
+        # merges all maps into a single seed -> location lookup table
+        segments = self.maps[0].segments()
+        for map_ in self.maps[1:]:
+            next_segments = map_.segments()
+            next_starts = [start for start, _, _ in next_segments]
+
+            composed: list[Segment] = []
+            for start, end, offset in segments:
+                # split the image of the segment at the breakpoints of the next map
+                image_start = start + offset
+                image_end = end + offset
+                idx = bisect_right(next_starts, image_start) - 1
+                while idx < len(next_segments) and next_starts[idx] < image_end:
+                    next_start, next_end, next_offset = next_segments[idx]
+                    composed.append(
+                        (
+                            max(image_start, next_start) - offset,
+                            min(image_end, next_end) - offset,
+                            offset + next_offset,
+                        )
+                    )
+                    idx += 1
+            segments = sorted(composed)
+
+        return ComposedMap.from_segments(segments)
+
+    @cached_property
+    def composed_map(self) -> ComposedMap:
+        # built on first use and kept, as the maps never change
+        return self.compose()
+
+    def convert_many(self, seeds: Iterable[int]) -> list[int]:
+        return self.composed_map.convert_many(seeds)
+
+
+@dataclass(frozen=True)
+class ShardResult:
+    start: int
+    end: int
+    min_location: int
+    seconds: float
+
+    @property
+    def seeds_per_second(self) -> float:
+        return (self.end - self.start) / self.seconds if self.seconds else math.inf
+
+
+# set once per worker process by the pool initializer, so the almanac does not
+# have to be pickled again for every shard
+_worker_almanac: Almanac | None = None
+
+
+def _init_worker(almanac: Almanac) -> None:
+    global _worker_almanac
+    _worker_almanac = almanac
+
+
+def _scan_shard(shard: Interval) -> ShardResult:
+    start, end = shard
+    started = time.perf_counter()
+    min_location = min(map(_worker_almanac.convert, range(start, end)))
+    return ShardResult(start, end, min_location, time.perf_counter() - started)
 
-    seed_pairs = list(zip(almanac.seeds[::2], almanac.seeds[1::2]))
-    seed_iterable = chain.from_iterable(
-        range(pair[0], pair[0] + pair[1] + 1) for pair in seed_pairs
-    )
 
-    # FIXME: too many iterations
-    for seed in seed_iterable:
-        soil = almanac.seed_to_soil_map.convert(seed)
-        fertilizer = almanac.soil_to_fertilizer_map.convert(soil)
-        water = almanac.fertilizer_to_water_map.convert(fertilizer)
-        light = almanac.water_to_light_map.convert(water)
-        temperature = almanac.light_to_temperature_map.convert(light)
-        humidity = almanac.temperature_to_humidity_map.convert(temperature)
-        location = almanac.humidity_to_location_map.convert(humidity)
+def split_into_shards(
+    intervals: list[Interval], chunk_size: int = CHUNK_SIZE
+) -> list[Interval]:
+    return [
+        (chunk_start, min(chunk_start + chunk_size, end))
+        for start, end in intervals
+        for chunk_start in range(start, end, chunk_size)
+    ]
 
-        if location < min_:
-            min_ = location
 
-    return min_
+def scan_seeds_parallel(
+    almanac: Almanac, workers: int, chunk_size: int = CHUNK_SIZE
+) -> tuple[int, list[ShardResult]]:
+    shards = split_into_shards(almanac.seed_intervals(), chunk_size)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(almanac,)
+    ) as executor:
+        results = list(executor.map(_scan_shard, shards))
+
+    return min(result.min_location for result in results), results
+
+
+@instrument
+def parse(text: str) -> Almanac:
+    return Almanac.from_input(text)
+
+
+@instrument
+def puzzle_1(almanac: Almanac) -> int:
+    return min(almanac.convert_many(almanac.seeds))
+
+
+@instrument
+def puzzle_2(almanac: Almanac, bruteforce: bool = False, workers: int = 1) -> int:
+    if bruteforce and workers > 1:
+        return scan_seeds_parallel(almanac, workers)[0]
+
+    if bruteforce:
+        # converts every single seed, only feasible for small inputs
+        seed_iterable = chain.from_iterable(
+            range(start, end) for start, end in almanac.seed_intervals()
+        )
+        return min(almanac.convert(seed) for seed in seed_iterable)
+
+    # pushes whole seed intervals through the maps, splitting them at the range
+    # boundaries, so the work depends on the number of ranges and not on the seeds
+    return min(
+        start for start, _ in almanac.convert_intervals(almanac.seed_intervals())
+    )
 
 
 if __name__ == "__main__":
-    almanac = Almanac.from_input(get_input(5))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bruteforce", action="store_true")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_MAXSIZE,
+        help="max cached values per map, 0 disables the cache, -1 is unbounded",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="scans the seeds with the given number of processes, implies --bruteforce",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    cache_maxsize = None if args.cache_size < 0 else args.cache_size
+    almanac = Almanac.from_input(get_input(5), cache_maxsize=cache_maxsize)
     print(puzzle_1(almanac))
-    # print(puzzle_2(almanac))
+
+    if args.workers > 1:
+        location, shards = scan_seeds_parallel(almanac, args.workers, args.chunk_size)
+        print(location)
+        for shard in shards:
+            print(
+                f"shard [{shard.start}, {shard.end}): {shard.seconds:.2f}s, "
+                f"{shard.seeds_per_second:,.0f} seeds/s",
+                file=sys.stderr,
+            )
+    else:
+        print(puzzle_2(almanac, bruteforce=args.bruteforce))
+        if args.bruteforce:
+            for name, stats in almanac.cache_stats().items():
+                print(f"{name}: {stats}", file=sys.stderr)
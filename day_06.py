@@ -1,11 +1,24 @@
-from utils import get_input
+from utils import get_input, instrument
+from tokenizer import ints
 from dataclasses import dataclass
+import enum
+import math
+
+PARSER_VERSION = 1
+CACHE_PARSED = False
+
+
+class Strategy(enum.Enum):
+    LINEAR = enum.auto()
+    BINARY_SEARCH = enum.auto()
+    CLOSED_FORM = enum.auto()
 
 
 @dataclass(frozen=True)
 class Race:
     time: int
     record: int
+    strategy: Strategy = Strategy.CLOSED_FORM
 
     def beats_record(self, t: int) -> bool:
         # distance < (time - holding) * holding
@@ -13,6 +26,53 @@ class Race:
         return self.record < ((self.time - t) * t)
 
     def calculate_num_winning_times(self) -> int:
+        if self.strategy == Strategy.CLOSED_FORM:
+            first_winning_number = self._first_winning_time_closed_form()
+        elif self.strategy == Strategy.BINARY_SEARCH:
+            first_winning_number = self._first_winning_time_binary_search()
+        else:
+            return self._calculate_num_winning_times_linear()
+
+        if first_winning_number is None:
+            return 0
+
+        # the distance is symmetric around time / 2, so is the last winning time
+        last_winning_number = self.time - first_winning_number
+        return (last_winning_number - first_winning_number) + 1
+
+    def _first_winning_time_closed_form(self) -> int | None:
+        # roots of t^2 - time * t + record = 0, integer only so huge numbers
+        # don't run into float precision issues
+        discriminant = self.time * self.time - 4 * self.record
+        if discriminant <= 0:
+            return None
+
+        t = (self.time - math.isqrt(discriminant)) // 2
+        # isqrt rounds down, so t is at most off by one in either direction
+        while t > 0 and self.beats_record(t - 1):
+            t -= 1
+        while t <= self.time // 2 and not self.beats_record(t):
+            t += 1
+
+        return t if t <= self.time // 2 else None
+
+    def _first_winning_time_binary_search(self) -> int | None:
+        # the distance grows until time / 2, so the first winning time can be
+        # searched for in the first half
+        low, high = 0, self.time // 2
+        if not self.beats_record(high):
+            return None
+
+        while low < high:
+            middle = (low + high) // 2
+            if self.beats_record(middle):
+                high = middle
+            else:
+                low = middle + 1
+
+        return low
+
+    def _calculate_num_winning_times_linear(self) -> int:
         first_winning_number: int = None
         last_winning_number: int = None
 
@@ -29,6 +89,15 @@ class Race:
         return (last_winning_number - first_winning_number) + 1
 
 
+@instrument
+def parse(text: str) -> list[Race]:
+    # the times come first, then the distances
+    values = ints(text)
+    races_count = len(values) // 2
+    return [Race(t, d) for t, d in zip(values[:races_count], values[races_count:])]
+
+
+@instrument
 def puzzle_1(races: list[Race]):
     res = 1
     for race in races:
@@ -36,20 +105,17 @@ def puzzle_1(races: list[Race]):
     return res
 
 
-def puzzle_2(race: Race):
+@instrument
+def puzzle_2(races: list[Race]):
+    # the spaces between the numbers are meant to be ignored
+    race = Race(
+        int("".join(str(race.time) for race in races)),
+        int("".join(str(race.record) for race in races)),
+    )
     return race.calculate_num_winning_times()
 
 
 if __name__ == "__main__":
-    times_line, distances_line = get_input(6).splitlines()
-    times = [int(i) for i in times_line.split(": ")[1].split(" ") if i]
-    distances = [int(i) for i in distances_line.split(": ")[1].split(" ") if i]
-
-    races_part1 = [Race(t, d) for t, d in zip(times, distances)]
-    race_part_2 = Race(
-        int("".join(str(i) for i in times)),
-        int("".join(str(i) for i in distances)),
-    )
-
-    print(puzzle_1(races_part1))
-    print(puzzle_2(race_part_2))
+    races = parse(get_input(6))
+    print(puzzle_1(races))
+    print(puzzle_2(races))
@@ -1,8 +1,16 @@
-from utils import get_input
-from dataclasses import dataclass
+from utils import get_input, get_cache_path, instrument
+from dataclasses import dataclass, field
 import enum
 from collections import Counter
 from itertools import product
+from operator import attrgetter
+from typing import Hashable, Iterable
+import argparse
+import mmap
+import os
+
+PARSER_VERSION = 4
+CACHE_PARSED = True
 
 
 class HandType(enum.IntEnum):
@@ -15,6 +23,105 @@ class HandType(enum.IntEnum):
     FIVE = enum.auto()
 
 
+def hand_type_from_group_sizes(group_sizes: list[int]) -> HandType:
+    # sizes of the groups of equal cards, largest first, e.g. [3, 2]
+    largest = group_sizes[0]
+    second_largest = group_sizes[1] if len(group_sizes) > 1 else 0
+
+    if largest == 5:
+        return HandType.FIVE
+    if largest == 4:
+        return HandType.FOUR
+    if largest == 3:
+        return HandType.FULL_HOUSE if second_largest == 2 else HandType.THREE
+    if largest == 2:
+        return HandType.TWO_PAIR if second_largest == 2 else HandType.ONE_PAIR
+    return HandType.NOTHING
+
+
+def best_hand_type(
+    cards: Iterable[Hashable], joker: Hashable | None = None
+) -> HandType:
+    # cards as symbols or indices. the best hand always comes from turning all
+    # jokers into the card that is already there most often
+    counter = Counter(cards)
+    jokers_count = counter.pop(joker, 0) if joker is not None else 0
+    group_sizes = sorted(counter.values(), reverse=True) or [0]
+    group_sizes[0] += jokers_count
+    return hand_type_from_group_sizes(group_sizes)
+
+
+CARD_VALUES = {
+    **{str(i): i for i in range(2, 10)},
+    "T": 10,
+    "J": 11,
+    "Q": 12,
+    "K": 13,
+    "A": 14,
+}
+# a hand is encoded as base 13 number with one digit per card, the digit being
+# the index of the card symbol in here
+CARD_SYMBOLS = "23456789TJQKA"
+# card values with the joker rules, J is the weakest card
+JOKER_CARD_VALUES = CARD_VALUES | {"J": 1}
+CARD_SYMBOL_INDICES = {symbol: idx for idx, symbol in enumerate(CARD_SYMBOLS)}
+HANDS_COUNT = len(CARD_SYMBOLS) ** 5
+HAND_TYPE_TABLE_FILENAME = "day_07_hand_types_v1.bin"
+
+
+def encode_hand(symbols: Iterable[str]) -> int:
+    idx = 0
+    for symbol in symbols:
+        idx = idx * 13 + CARD_SYMBOL_INDICES[symbol]
+    return idx
+
+
+class HandTypeTable:
+    # hand types of all possible hands indexed by encode_hand, one byte each.
+    # the first HANDS_COUNT bytes are using the normal rules, the rest the
+    # joker rules
+    def __init__(self, buffer: bytes | mmap.mmap) -> None:
+        self.buffer = buffer
+        view = memoryview(buffer)
+        self._normal_view = view[:HANDS_COUNT]
+        self._joker_view = view[HANDS_COUNT:]
+
+    @classmethod
+    def generate(cls) -> "HandTypeTable":
+        joker_idx = CARD_SYMBOL_INDICES["J"]
+        buffer = bytearray(2 * HANDS_COUNT)
+        # product yields the hands in the order of their base 13 encoding
+        for idx, hand in enumerate(product(range(len(CARD_SYMBOLS)), repeat=5)):
+            buffer[idx] = best_hand_type(hand)
+            buffer[HANDS_COUNT + idx] = best_hand_type(hand, joker=joker_idx)
+
+        return cls(bytes(buffer))
+
+    @classmethod
+    def load(cls, path: str | None = None) -> "HandTypeTable":
+        # generates the table on the first run, afterwards it is just mapped
+        # into memory
+        path = path or get_cache_path(HAND_TYPE_TABLE_FILENAME)
+        # a truncated or otherwise damaged file is generated again
+        if not os.path.exists(path) or os.path.getsize(path) != 2 * HANDS_COUNT:
+            table = cls.generate()
+            with open(f"{path}.tmp", "wb") as fp:
+                fp.write(table.buffer)
+            os.replace(f"{path}.tmp", path)
+
+        with open(path, "rb") as fp:
+            return cls(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def classify(self, idx: int, with_joker_rules: bool) -> HandType:
+        view = self._joker_view if with_joker_rules else self._normal_view
+        return HandType(view[idx])
+
+    def classify_many(self, indices: Iterable[int], with_joker_rules: bool) -> bytes:
+        # one hand type value per index
+        view = self._joker_view if with_joker_rules else self._normal_view
+        return bytes(map(view.__getitem__, indices))
+
+
 @dataclass(frozen=True)
 class Card:
     symbol: str
@@ -24,16 +131,7 @@ class Card:
 
     @property
     def value(self) -> int:
-        if self.symbol.isdigit():
-            return int(self.symbol)
-
-        return {
-            "T": 10,
-            "J": 11,
-            "Q": 12,
-            "K": 13,
-            "A": 14,
-        }[self.symbol]
+        return CARD_VALUES[self.symbol]
 
     def __eq__(self, other: "Card") -> bool:
         return self.value == other.value
@@ -51,30 +149,72 @@ class JokerCard(Card):
 
 @dataclass(frozen=True)
 class Hand:
-    cards: list[Card]
+    # the card symbols, e.g. "32T3K"
+    symbols: str
     bid: int
+    # J is a joker that counts as any other card
+    with_joker_rules: bool = False
+    # index of the cards in a HandTypeTable, calculated if not given
+    idx: int | None = None
+    # e.g. looked up in a HandTypeTable, calculated from the symbols if not given
+    hand_type: HandType | None = None
+    # hand type in the high bits and 4 bits per card value below, so hands
+    # can be ranked by comparing plain ints
+    key: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        # works on the symbols only, the Card objects are just built on demand
+        if self.idx is None:
+            object.__setattr__(self, "idx", encode_hand(self.symbols))
+        if self.hand_type is None:
+            joker = "J" if self.with_joker_rules else None
+            object.__setattr__(
+                self, "hand_type", best_hand_type(self.symbols, joker=joker)
+            )
+        object.__setattr__(self, "key", self.calculate_key(self.hand_type))
 
     @classmethod
-    def from_line(cls, line: str, joker_cards: bool = False):
+    @instrument
+    def from_line(
+        cls,
+        line: str,
+        joker_cards: bool = False,
+        idx: int | None = None,
+        hand_type: HandType | None = None,
+    ):
         cards_inp, bid = line.split(" ")
-
-        cards: list[Card] = []
-        for symbol in cards_inp:
-            if symbol == "J" and joker_cards:
-                card = JokerCard(symbol)
-            else:
-                card = Card(symbol)
-
-            cards.append(card)
-
         return cls(
-            cards=cards,
+            symbols=cards_inp,
             bid=int(bid),
+            with_joker_rules=joker_cards,
+            idx=idx,
+            hand_type=hand_type,
+        )
+
+    def with_jokers(self, hand_type: HandType | None = None) -> "Hand":
+        return Hand(
+            symbols=self.symbols,
+            bid=self.bid,
+            with_joker_rules=True,
+            idx=self.idx,
+            hand_type=hand_type,
         )
 
+    @property
+    def cards(self) -> list[Card]:
+        return [
+            (
+                JokerCard(symbol)
+                if symbol == "J" and self.with_joker_rules
+                else Card(symbol)
+            )
+            for symbol in self.symbols
+        ]
+
     @property
     def card_values(self) -> tuple[int, int, int, int, int]:
-        return tuple(card.value for card in self.cards)
+        values = JOKER_CARD_VALUES if self.with_joker_rules else CARD_VALUES
+        return tuple(values[symbol] for symbol in self.symbols)
 
     def _calculate_hand_type_without_joker(self) -> HandType:
         counter = Counter(self.cards)
@@ -107,6 +247,10 @@ class Hand:
         return HandType.NOTHING
 
     def _calculate_best_hand_type_using_jokers(self) -> HandType:
+        return best_hand_type(self.symbols, joker="J")
+
+    def _calculate_best_hand_type_using_jokers_bruteforce(self) -> HandType:
+        # reference implementation for _calculate_best_hand_type_using_jokers
         if not any(c.symbol == "J" for c in self.cards):
             return self._calculate_hand_type_without_joker()
 
@@ -126,43 +270,78 @@ class Hand:
             cards = self.cards[:]
             for i, joker_idx in enumerate(joker_indicies):
                 cards[joker_idx] = Card(symbol=perm[i])
-            joker_hand = Hand(cards=cards, bid=0)
+            joker_hand = Hand(symbols="".join(card.symbol for card in cards), bid=0)
             possible_hand_types.add(joker_hand._calculate_hand_type_without_joker())
 
         return max(possible_hand_types)
 
-    def calculate_hand_type(self, with_joker_rules: bool) -> HandType:
+    def calculate_hand_type(
+        self, with_joker_rules: bool, bruteforce: bool = False
+    ) -> HandType:
+        if with_joker_rules and bruteforce:
+            return self._calculate_best_hand_type_using_jokers_bruteforce()
         if with_joker_rules:
             return self._calculate_best_hand_type_using_jokers()
         return self._calculate_hand_type_without_joker()
 
+    def calculate_key(self, hand_type: HandType) -> int:
+        key = hand_type
+        for value in self.card_values:
+            key = (key << 4) | value
+        return key
+
+
+@instrument
+def parse(text: str, table: HandTypeTable | None = None) -> list[Hand]:
+    lines = text.splitlines()
+    if table is None:
+        return [Hand.from_line(line) for line in lines]
+
+    # classifies all hands with a single gather over the table
+    indices = [encode_hand(line.partition(" ")[0]) for line in lines]
+    hand_types = table.classify_many(indices, with_joker_rules=False)
+    return [
+        Hand.from_line(line, idx=idx, hand_type=HandType(hand_type))
+        for line, idx, hand_type in zip(lines, indices, hand_types)
+    ]
 
-def puzzle_1() -> int:
-    hands = [Hand.from_line(line) for line in get_input(7).splitlines()]
-    sorted_hands = sorted(
-        hands,
-        key=lambda hand: (
-            hand.calculate_hand_type(with_joker_rules=False),
-            *hand.card_values,
-        ),
-    )
+
+def calculate_total_winnings(hands: list[Hand]) -> int:
+    sorted_hands = sorted(hands, key=attrgetter("key"))
     return sum(rank * hand.bid for rank, hand in enumerate(sorted_hands, start=1))
 
 
-def puzzle_2() -> int:
-    hands = [
-        Hand.from_line(line, joker_cards=True) for line in get_input(7).splitlines()
-    ]
-    sorted_hands = sorted(
-        hands,
-        key=lambda h: (
-            h.calculate_hand_type(with_joker_rules=True),
-            *h.card_values,
-        ),
+@instrument
+def puzzle_1(hands: list[Hand]) -> int:
+    return calculate_total_winnings(hands)
+
+
+@instrument
+def puzzle_2(hands: list[Hand], table: HandTypeTable | None = None) -> int:
+    if table is None:
+        return calculate_total_winnings([hand.with_jokers() for hand in hands])
+
+    hand_types = table.classify_many(
+        (hand.idx for hand in hands), with_joker_rules=True
+    )
+    return calculate_total_winnings(
+        [
+            hand.with_jokers(HandType(hand_type))
+            for hand, hand_type in zip(hands, hand_types)
+        ]
     )
-    return sum(rank * hand.bid for rank, hand in enumerate(sorted_hands, start=1))
 
 
 if __name__ == "__main__":
-    print(puzzle_1())
-    print(puzzle_2())
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--lookup-table",
+        action="store_true",
+        help="classifies the hands using a precomputed table of all hands",
+    )
+    args = parser.parse_args()
+
+    table = HandTypeTable.load() if args.lookup_table else None
+    hands = parse(get_input(7), table=table)
+    print(puzzle_1(hands))
+    print(puzzle_2(hands, table=table))
@@ -1,91 +1,309 @@
-from utils import get_input
-from typing import Literal, Union
-import re
+from utils import get_input, instrument
+from tokenizer import chunks, iter_fields
+from typing import Iterator, Literal
+from array import array
+import pickle
 from dataclasses import dataclass
-from collections import defaultdict
 import math
 
+PARSER_VERSION = 1
+CACHE_PARSED = True
+
 INSTRUCTIONS = tuple[Literal["L"] | Literal["R"]]
+# marks nodes of the macro step table that were not visited yet
+UNSET = 0xFFFFFFFF
+
+
+@dataclass(frozen=True)
+class Network:
+    instructions: INSTRUCTIONS
+    # all node names concatenated, every name is name_width bytes long and
+    # node i is the i-th name
+    names: bytes
+    name_width: int
+    # indices of the left and right node of every node, memoryviews when
+    # loaded from the parsed input cache
+    left: array | memoryview
+    right: array | memoryview
+
+    @classmethod
+    @instrument
+    def from_input(cls, text: str):
+        instructions_inp, nodes_inp = text.split("\n\n")
+        instructions: INSTRUCTIONS = tuple(char for char in instructions_inp)
+
+        # every node line is a parent, left, right triple. the triples are
+        # streamed twice, first for the names and then for the edges, so they
+        # never all exist at once
+        def iter_edges() -> Iterator[tuple[str, str, str]]:
+            return chunks(iter_fields(nodes_inp, "=(),"), 3)
+
+        # name -> index, only needed until the nodes are wired up
+        indices = {parent: idx for idx, (parent, _, _) in enumerate(iter_edges())}
+
+        names = "".join(indices)
+        name_width = len(names) // len(indices) if indices else 0
+        if any(len(name) != name_width for name in indices):
+            raise ValueError("all node names need to have the same length")
+
+        left_indices = array("I", bytes(4 * len(indices)))
+        right_indices = array("I", bytes(4 * len(indices)))
+        for parent, left, right in iter_edges():
+            left_indices[indices[parent]] = indices[left]
+            right_indices[indices[parent]] = indices[right]
+
+        return cls(
+            instructions=instructions,
+            names=names.encode(),
+            name_width=name_width,
+            left=left_indices,
+            right=right_indices,
+        )
+
+    def __reduce_ex__(self, protocol: int):
+        # lets the index arrays be pickled out-of-band, so they can be loaded
+        # without copying them. older protocols can't do that and memoryviews
+        # can't be pickled at all, so they get copies
+        wrap = pickle.PickleBuffer if protocol >= 5 else bytes
+        return (
+            _network_from_buffers,
+            (
+                self.instructions,
+                self.names,
+                self.name_width,
+                wrap(self.left),
+                wrap(self.right),
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    def name(self, node: int) -> str:
+        start = node * self.name_width
+        return self.names[start : start + self.name_width].decode()
+
+    def index(self, name: str) -> int:
+        encoded = name.encode()
+        start = self.names.find(encoded)
+        while start != -1 and start % self.name_width:
+            start = self.names.find(encoded, start + 1)
+        if start == -1 or len(encoded) != self.name_width:
+            raise KeyError(name)
+        return start // self.name_width
+
+    def node_mask(self, name: str) -> bytearray:
+        mask = bytearray(len(self))
+        mask[self.index(name)] = 1
+        return mask
+
+    def suffix_mask(self, char: str) -> bytearray:
+        # 1 for every node whose name ends with char, else 0
+        if not self.name_width:
+            return bytearray(len(self))
+        last_chars = self.names[self.name_width - 1 :: self.name_width]
+        table = bytes(int(c == ord(char)) for c in range(256))
+        return bytearray(last_chars.translate(table))
+
+    def step_tables(self) -> list[array]:
+        # next node lookup for every position in the instructions
+        return [
+            self.left if instr == "L" else self.right for instr in self.instructions
+        ]
+
+
+def _network_from_buffers(
+    instructions: INSTRUCTIONS,
+    names: bytes,
+    name_width: int,
+    left: bytes | memoryview,
+    right: bytes | memoryview,
+) -> Network:
+    return Network(
+        instructions=instructions,
+        names=names,
+        name_width=name_width,
+        left=memoryview(left).cast("I"),
+        right=memoryview(right).cast("I"),
+    )
+
+
+class MacroStepTable:
+    # jumps over a whole pass of the instructions per lookup. only filled for
+    # the nodes a pass actually starts at, so it stays cheap for huge graphs
+    def __init__(self, network: Network, end_mask: bytearray) -> None:
+        self.end_mask = end_mask
+        self.step_tables = network.step_tables()
+        self.jumps = array("I", [UNSET]) * len(network)
+        # node -> steps into the pass that land on an end node, if any
+        self.end_offsets: dict[int, tuple[int, ...]] = {}
 
+    def step(self, node: int) -> tuple[int, tuple[int, ...]]:
+        target = self.jumps[node]
+        if target == UNSET:
+            end_mask = self.end_mask
+            end_offsets: list[int] = []
+            target = node
+            for offset, step_table in enumerate(self.step_tables, start=1):
+                target = step_table[target]
+                if end_mask[target]:
+                    end_offsets.append(offset)
 
-@dataclass
-class Node:
-    name: str
-    parent: Union["Node", None] = None
-    left: Union["Node", None] = None
-    right: Union["Node", None] = None
+            self.jumps[node] = target
+            if end_offsets:
+                self.end_offsets[node] = tuple(end_offsets)
 
-    def __repr__(self) -> str:
-        return f"Node(name={self.name!r}, left={self.left.name!r}, right={self.right.name!r})"
+        return target, self.end_offsets.get(node, ())
 
 
-def puzzle_1(start_node: Node, instructions: INSTRUCTIONS) -> int:
+@instrument
+def parse(text: str) -> Network:
+    return Network.from_input(text)
+
+
+@instrument
+def puzzle_1(network: Network) -> int:
+    # AAA -> ZZZ, longer names are only used by generated inputs
+    table = MacroStepTable(network, network.node_mask("Z" * network.name_width))
     steps = 0
-    i = 0
+    current_node = network.index("A" * network.name_width)
+    while True:
+        next_node, end_offsets = table.step(current_node)
+        if end_offsets:
+            return steps + end_offsets[0]
+        current_node = next_node
+        steps += len(network.instructions)
+
+
+@dataclass(frozen=True)
+class GhostCycle:
+    # the walk is in a cycle once it has done tail steps, from then on it
+    # repeats every cycle steps
+    tail: int
+    cycle: int
+    # steps 1..tail + cycle at which the walk is on an end node
+    end_steps: tuple[int, ...]
+
+    def is_end_step(self, step: int) -> bool:
+        if step > self.tail + self.cycle:
+            step = self.tail + 1 + (step - self.tail - 1) % self.cycle
+        return step in self.end_steps
+
+
+def find_cycle(table: MacroStepTable, start_node: int) -> GhostCycle:
+    # the instructions start over after every pass, so the walk is in a cycle
+    # as soon as a pass starts at an already seen node
+    pass_length = len(table.step_tables)
+    seen_nodes: dict[int, int] = {start_node: 0}
+    end_steps: list[int] = []
+    passes = 0
     current_node = start_node
-    while current_node.name != "ZZZ":
-        instr = instructions[i % len(instructions)]
-        current_node = current_node.left if instr == "L" else current_node.right
-        steps += 1
-        i += 1
+    while True:
+        current_node, end_offsets = table.step(current_node)
+        end_steps.extend(passes * pass_length + offset for offset in end_offsets)
+        passes += 1
+
+        if current_node in seen_nodes:
+            tail = seen_nodes[current_node] * pass_length
+            return GhostCycle(
+                tail=tail,
+                cycle=passes * pass_length - tail,
+                end_steps=tuple(end_steps),
+            )
+        seen_nodes[current_node] = passes
+
+
+def solve_congruences(
+    first: tuple[int, int], second: tuple[int, int]
+) -> tuple[int, int] | None:
+    # generalized chinese remainder theorem for (remainder, modulus) pairs,
+    # moduli don't have to be coprime
+    remainder_1, modulus_1 = first
+    remainder_2, modulus_2 = second
+    gcd = math.gcd(modulus_1, modulus_2)
+    if (remainder_2 - remainder_1) % gcd:
+        return None
+
+    lcm = modulus_1 // gcd * modulus_2
+    k = (
+        (remainder_2 - remainder_1)
+        // gcd
+        * pow(modulus_1 // gcd, -1, modulus_2 // gcd)
+        % (modulus_2 // gcd)
+    )
+    return (remainder_1 + modulus_1 * k) % lcm, lcm
 
-    return steps
 
+def combine_cycles(cycles: list[GhostCycle]) -> int | None:
+    # first step > 0 at which every ghost is on an end node
+    if not cycles:
+        # nothing to wait for, same as simulate_lockstep without ghosts
+        return 1
 
-def puzzle_2(start_nodes: list[Node], instructions: INSTRUCTIONS) -> int:
+    longest_tail = max(cycles, key=lambda c: c.tail)
+
+    # before all ghosts are in their cycle, only the end steps of the ghost
+    # with the longest tail are possible
+    for step in longest_tail.end_steps:
+        if step > longest_tail.tail:
+            break
+        if all(cycle.is_end_step(step) for cycle in cycles):
+            return step
+
+    # afterwards every ghost is on an end node at one of its end steps in the
+    # cycle plus a multiple of its cycle length
+    congruences: list[tuple[int, int]] = [(0, 1)]
+    for cycle in cycles:
+        residues = {step % cycle.cycle for step in cycle.end_steps if step > cycle.tail}
+        congruences = [
+            combined
+            for congruence in congruences
+            for residue in residues
+            if (combined := solve_congruences(congruence, (residue, cycle.cycle)))
+            is not None
+        ]
+
+    if not congruences:
+        return None
+
+    min_step = longest_tail.tail + 1
+    return min(
+        min_step + (remainder - min_step) % modulus
+        for remainder, modulus in congruences
+    )
+
+
+def simulate_lockstep(
+    network: Network, start_nodes: list[int], end_mask: bytearray
+) -> int:
+    # moves all ghosts at once, every step is a single gather over the
+    # positions of all ghosts, running at C speed via map
+    step_tables = network.step_tables()
+    current_nodes = start_nodes
     steps = 0
-    i = 0
-    current_nodes = start_nodes[:]
-    start_nodes_to_end_node_steps: dict[str, int | None] = defaultdict(None)
-    while not len(start_nodes_to_end_node_steps) == len(start_nodes):
-        instr = instructions[i % len(instructions)]
-        for idx, node in enumerate(current_nodes):
-            if start_nodes[idx].name in start_nodes_to_end_node_steps:
-                continue
-            new_code = node.left if instr == "L" else node.right
-            current_nodes[idx] = new_code
-            if new_code.name.endswith("Z"):
-                start_nodes_to_end_node_steps[start_nodes[idx].name] = steps + 1
+    while True:
+        for step_table in step_tables:
+            current_nodes = list(map(step_table.__getitem__, current_nodes))
+            steps += 1
+            if all(map(end_mask.__getitem__, current_nodes)):
+                return steps
+
+
+@instrument
+def puzzle_2(network: Network, simulate: bool = False) -> int:
+    end_mask = network.suffix_mask("Z")
+    start_mask = network.suffix_mask("A")
+    start_nodes = [node for node in range(len(network)) if start_mask[node]]
 
-        steps += 1
-        i += 1
+    if simulate:
+        # only feasible if the ghosts line up after a reasonable number of steps
+        return simulate_lockstep(network, start_nodes, end_mask)
 
-    return math.lcm(*list(start_nodes_to_end_node_steps.values()))
+    table = MacroStepTable(network, end_mask)
+    return combine_cycles([find_cycle(table, start_node) for start_node in start_nodes])
 
 
 if __name__ == "__main__":
-    instructions_inp, nodes_inp = get_input(8).split("\n\n")
-    instructions: INSTRUCTIONS = tuple(char for char in instructions_inp)
-
-    pattern = re.compile(r"[A-Z|1-9]{3}")
-    nodes_lookup: dict[str, Node] = {}
-    for line in nodes_inp.splitlines():
-        parent, left, right = pattern.findall(line)
-
-        if parent in nodes_lookup:
-            parent_node = nodes_lookup[parent]
-        else:
-            parent_node = Node(name=parent)
-            nodes_lookup[parent_node.name] = parent_node
-
-        if left in nodes_lookup:
-            left_node = nodes_lookup[left]
-        else:
-            left_node = Node(name=left, parent=parent_node)
-            nodes_lookup[left_node.name] = left_node
-        parent_node.left = left_node
-
-        if right in nodes_lookup:
-            right_node = nodes_lookup[right]
-        else:
-            right_node = Node(name=right, parent=parent_node)
-            nodes_lookup[right_node.name] = right_node
-        parent_node.right = right_node
-
-    print(puzzle_1(nodes_lookup["AAA"], instructions))
-    print(
-        puzzle_2(
-            [node for name, node in nodes_lookup.items() if name.endswith("A")],
-            instructions,
-        )
-    )
+    network = parse(get_input(8))
+    print(puzzle_1(network))
+    print(puzzle_2(network))
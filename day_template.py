@@ -1,12 +1,19 @@
 from utils import get_input
 
+# bump whenever parse or the parsed classes change, invalidates cached inputs
+PARSER_VERSION = 1
+# caches parse results in inputs/.cache, only worth it if loading them is
+# measurably faster than parsing
+CACHE_PARSED = False
 
-def puzzle_1():
-    ...
 
+def parse(text: str): ...
 
-def puzzle_2():
-    ...
+
+def puzzle_1(parsed): ...
+
+
+def puzzle_2(parsed): ...
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+from day_07 import CARD_SYMBOLS, Hand, HandTypeTable, encode_hand
+from itertools import combinations_with_replacement, permutations
+
+
+def test_joker_rules_match_bruteforce():
+    # the hand type does not depend on the order of the cards, so every
+    # multiset of 5 cards is enough. the bruteforce is the reference
+    for symbols in combinations_with_replacement(CARD_SYMBOLS, 5):
+        hand = Hand(symbols="".join(symbols), bid=0, with_joker_rules=True)
+        assert hand.calculate_hand_type(True) == hand.calculate_hand_type(
+            True, bruteforce=True
+        ), "".join(symbols)
+
+
+def test_hand_type_table_matches_hands(tmp_path):
+    # checks every ordering of every multiset, the types are only calculated
+    # once per multiset
+    table = HandTypeTable.load(str(tmp_path / "hand_types.bin"))
+    for symbols in combinations_with_replacement(CARD_SYMBOLS, 5):
+        hand = Hand(symbols="".join(symbols), bid=0)
+        hand_type = hand.calculate_hand_type(False)
+        joker_hand_type = hand.calculate_hand_type(True)
+        for ordering in set(permutations(symbols)):
+            idx = encode_hand(ordering)
+            assert table.classify(idx, False) == hand_type, ordering
+            assert table.classify(idx, True) == joker_hand_type, ordering
@@ -0,0 +1,48 @@
+from array import array
+from typing import Iterable, Iterator, Sized
+
+# bulk tokenizing of whole inputs. bytes.translate and bytes.split run in C,
+# which is a lot faster than a regex or splitting the input line by line
+
+# keeps the digits and turns every other byte into whitespace
+DIGITS_TABLE = bytes(c if chr(c).isdigit() and c < 128 else 32 for c in range(256))
+
+
+def ints(text: str, typecode: str | None = None) -> list[int] | array:
+    # all integers of the text as python ints, or as a typed array if a
+    # typecode is given, which then has to be wide enough for the largest one.
+    # a minus sign is just a separator, so "-5" is read as 5
+    values = map(int, text.encode().translate(DIGITS_TABLE).split())
+    if typecode is None:
+        return list(values)
+    return array(typecode, values)
+
+
+def fields(text: str, separators: str = "") -> list[str]:
+    # splits the text at whitespace and at every char of separators, e.g.
+    # "AAA = (BBB, CCC)" with "=()," -> ["AAA", "BBB", "CCC"]
+    table = bytes.maketrans(separators.encode(), b" " * len(separators.encode()))
+    return text.encode().translate(table).decode().split()
+
+
+def iter_fields(
+    text: str, separators: str = "", chunk_size: int = 1 << 20
+) -> Iterator[str]:
+    # same as fields, but only tokenizes about chunk_size chars at a time, so
+    # the tokens of a huge input never all exist at once. the chunks end at a
+    # newline, so no token is cut in two
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + chunk_size)
+        end = len(text) if end == -1 else end + 1
+        yield from fields(text[start:end], separators)
+        start = end
+
+
+def chunks(values: Iterable, size: int) -> Iterator[tuple]:
+    # consecutive tuples of size values, e.g. the rows of a table that was
+    # tokenized as a whole. iterators are chunked lazily and raise the
+    # ValueError once they end with an incomplete chunk
+    if size <= 0 or (isinstance(values, Sized) and len(values) % size):
+        raise ValueError(f"values can't be split into chunks of {size}")
+    return zip(*[iter(values)] * size, strict=True)
@@ -1,3 +1,254 @@
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Iterator, TypeVar
+import atexit
+import cProfile
+import functools
+import glob
+import hashlib
+import mmap
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+T = TypeVar("T")
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    # highest amount of memory allocated during a single call
+    peak_memory_bytes: int = 0
+
+
+# profiling is off by default, instrumented functions then only pay for one
+# extra function call and a global lookup
+_profiling_enabled = False
+_stage_stats: dict[str, StageStats] = defaultdict(StageStats)
+# per running stage: traced memory at the start and the highest peak seen
+# while it was running, as tracemalloc only keeps a single global peak
+_memory_stack: list[list[int]] = []
+
+
+def enable_profiling() -> None:
+    global _profiling_enabled
+    _profiling_enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable_profiling() -> None:
+    global _profiling_enabled
+    _profiling_enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    if not _profiling_enabled:
+        yield
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    if _memory_stack:
+        _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+    _memory_stack.append([current, 0])
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        start_memory, peak_seen = _memory_stack.pop()
+        peak = max(peak, peak_seen)
+        if _memory_stack:
+            _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+
+        stats = _stage_stats[name]
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.peak_memory_bytes = max(stats.peak_memory_bytes, peak - start_memory)
+
+
+def instrument(func: Callable[..., T]) -> Callable[..., T]:
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> T:
+        if not _profiling_enabled:
+            return func(*args, **kwargs)
+        with stage(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def profiling_report() -> str:
+    lines = [f"{'stage':<40} {'calls':>9} {'total':>12} {'peak memory':>14}"]
+    for name, stats in sorted(_stage_stats.items()):
+        lines.append(
+            f"{name:<40} {stats.calls:>9} {stats.seconds * 1000:>9.2f} ms "
+            f"{stats.peak_memory_bytes / 2**20:>10.2f} MiB"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def cprofile_to(path: str) -> Iterator[None]:
+    # writes a cProfile file, e.g. for snakeviz or pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+if os.environ.get("AOC_PROFILE") == "1":
+    # lets the single day scripts be profiled without any changes
+    enable_profiling()
+    atexit.register(lambda: print(profiling_report(), file=sys.stderr))
+
+
+def get_input_path(day: int) -> str:
+    return f"./inputs/{str(day).rjust(2, '0')}.txt"
+
+
+def get_cache_path(filename: str) -> str:
+    # generated files that are expensive to create live next to the inputs
+    os.makedirs("./inputs/.cache", exist_ok=True)
+    return f"./inputs/.cache/{filename}"
+
+
+@instrument
 def get_input(day: int) -> str:
-    with open(f"./inputs/{str(day).rjust(2, '0')}.txt", "r") as fp:
+    with open(get_input_path(day), "r") as fp:
         return fp.read()
+
+
+def iter_input_lines(day: int) -> Iterator[str]:
+    # yields the lines one by one without the trailing newline, so only the
+    # current line has to be kept in memory
+    with open(get_input_path(day), "r") as fp:
+        for line in fp:
+            yield line.rstrip("\n")
+
+
+@contextmanager
+def map_input(day: int) -> Iterator[mmap.mmap | bytes]:
+    # read-only bytes view of the input, pages are loaded by the os on access
+    with open(get_input_path(day), "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:  # empty files can't be mapped
+            yield b""
+            return
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def load_parsed(day: int, parse: Callable[[str], T], parser_version: int) -> T:
+    # caches the parsed input next to the inputs, keyed by the hash of the input
+    # file and the version of the parser (bump it whenever parse or the parsed
+    # classes change). objects that pickle their data as PickleBuffer are
+    # loaded zero-copy straight from a memory mapped file
+    with open(get_input_path(day), "rb") as fp:
+        digest = hashlib.file_digest(fp, "sha256").hexdigest()[:16]
+
+    prefix = str(day).rjust(2, "0")
+    pickle_path = get_cache_path(f"{prefix}-v{parser_version}-{digest}.pickle")
+    buffers_path = get_cache_path(f"{prefix}-v{parser_version}-{digest}.buffers")
+
+    if os.path.exists(pickle_path):
+        with open(pickle_path, "rb") as fp:
+            buffer_spans: list[tuple[int, int]] = pickle.load(fp)
+            payload = fp.read()
+
+        buffers: list[memoryview] = []
+        if buffer_spans:
+            with open(buffers_path, "rb") as fp:
+                if os.fstat(fp.fileno()).st_size == 0:  # empty files can't be mapped
+                    view = memoryview(b"")
+                else:
+                    # the views keep the mapping alive after the file is closed
+                    view = memoryview(
+                        mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+            buffers = [view[start : start + size] for start, size in buffer_spans]
+
+        return pickle.loads(payload, buffers=buffers)
+
+    with open(get_input_path(day), "r") as fp:
+        parsed = parse(fp.read())
+
+    pickle_buffers: list[pickle.PickleBuffer] = []
+    payload = pickle.dumps(parsed, protocol=5, buffer_callback=pickle_buffers.append)
+
+    # drop the files of older inputs or parser versions of the same day
+    for path in glob.glob(get_cache_path(f"{prefix}-v*")):
+        os.remove(path)
+
+    buffer_spans = []
+    with open(f"{buffers_path}.tmp", "wb") as fp:
+        for pickle_buffer in pickle_buffers:
+            raw = pickle_buffer.raw()
+            buffer_spans.append((fp.tell(), raw.nbytes))
+            fp.write(raw)
+            fp.write(bytes(-raw.nbytes % 8))  # keeps the buffers aligned
+    with open(f"{pickle_path}.tmp", "wb") as fp:
+        pickle.dump(buffer_spans, fp)
+        fp.write(payload)
+
+    # the pickle file is written last, as its existence marks a complete cache
+    os.replace(f"{buffers_path}.tmp", buffers_path)
+    os.replace(f"{pickle_path}.tmp", pickle_path)
+    return parsed
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class LRUCache(Generic[K, V]):
+    # maxsize=None never evicts anything, maxsize=0 disables the cache
+    def __init__(self, maxsize: int | None = 1024) -> None:
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compute(self, key: K, compute: Callable[[K], V]) -> V:
+        if self.maxsize == 0:
+            return compute(key)
+
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.stats.misses += 1
+            value = compute(key)
+            self._data[key] = value
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+            return value
+
+        self.stats.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.stats = CacheStats()